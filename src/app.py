@@ -7,15 +7,17 @@ import asyncio
 import logging
 import os
 from datetime import datetime
+from pathlib import Path
 from typing import Optional
 
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
-from agents import create_agent_system
-from surrealdb_client import SurrealDBClient
+from agents import ActivityLogger, create_agent_system
+from embeddings import close_openai_client
+from surrealdb_client import SurrealDBPool
 
 # Configure logging
 logging.basicConfig(
@@ -25,12 +27,31 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
-app = FastAPI(title="ADK SurrealDB Multi-Agent System")
+app = FastAPI(title="ADK SurrealDB Multi-Agent System", default_response_class=ORJSONResponse)
+
+# Static UI, read once at import and served from memory
+STATIC_DIR = Path(__file__).parent / "static"
+INDEX_HTML = (STATIC_DIR / "index.html").read_bytes()
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+
+# SurrealDB connection pool size, and how many /api/query requests may run at
+# once (defaults to one per pooled connection)
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+SURREALDB_POOL_SIZE = int(os.getenv("SURREALDB_POOL_SIZE", str(min(32, WORKERS * 4))))
+QUERY_SEM = asyncio.Semaphore(int(os.getenv("MAX_CONCURRENT_QUERIES", str(SURREALDB_POOL_SIZE))))
 
 # Global state
-db_client: Optional[SurrealDBClient] = None
+db_client: Optional[SurrealDBPool] = None
 agent_system = None
 
+# stats_counter record -> /api/stats field
+STATS_COUNTERS = {
+    "research": "total_research",
+    "agent_memory": "total_memories",
+    "conversation": "total_messages",
+    "agent_activity": "total_activities"
+}
+
 class QueryRequest(BaseModel):
     query: str
     session_id: Optional[str] = None
@@ -55,17 +76,31 @@ async def startup_event():
     db_user = os.getenv("SURREALDB_USER", "root")
     db_pass = os.getenv("SURREALDB_PASS", "root")
     
-    db_client = SurrealDBClient(
+    db_client = SurrealDBPool(
         url=db_url,
         namespace=db_ns,
         database=db_name,
         username=db_user,
-        password=db_pass
+        password=db_pass,
+        size=SURREALDB_POOL_SIZE
     )
     
     await db_client.connect()
     logger.info("✅ Connected to SurrealDB")
     
+    # Seed the stats counters from the real row counts. Table events (also in
+    # init.surql) keep them current server-side, so any client's inserts count
+    # and request transactions never touch the counter records themselves
+    await db_client.query(";\n".join(
+        f"DEFINE EVENT OVERWRITE stats_counter_{table} ON {table} WHEN $event = 'CREATE' "
+        f"THEN (UPSERT stats_counter:{table} SET count += 1)"
+        for table in STATS_COUNTERS
+    ))
+    await db_client.query(";\n".join(
+        f"UPSERT stats_counter:{table} SET count = (SELECT count() FROM {table} GROUP ALL)[0].count ?? 0"
+        for table in STATS_COUNTERS
+    ))
+    
     # Initialize agent system
     agent_system = await create_agent_system(db_client)
     logger.info("✅ Agent system initialized")
@@ -77,6 +112,8 @@ async def shutdown_event():
     """Cleanup on shutdown"""
     global db_client
     
+    await close_openai_client()
+    
     if db_client:
         await db_client.close()
         logger.info("👋 Disconnected from SurrealDB")
@@ -84,251 +121,7 @@ async def shutdown_event():
 @app.get("/", response_class=HTMLResponse)
 async def root():
     """Serve the main UI"""
-    html_content = """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>ADK SurrealDB Multi-Agent System</title>
-        <style>
-            body {
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, Cantarell, sans-serif;
-                max-width: 1200px;
-                margin: 0 auto;
-                padding: 20px;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                min-height: 100vh;
-            }
-            .container {
-                background: white;
-                border-radius: 10px;
-                padding: 30px;
-                box-shadow: 0 10px 40px rgba(0,0,0,0.2);
-            }
-            h1 {
-                color: #667eea;
-                margin-bottom: 10px;
-            }
-            .subtitle {
-                color: #666;
-                margin-bottom: 30px;
-            }
-            .query-section {
-                margin-bottom: 30px;
-            }
-            textarea {
-                width: 100%;
-                padding: 15px;
-                border: 2px solid #e0e0e0;
-                border-radius: 5px;
-                font-size: 16px;
-                font-family: inherit;
-                resize: vertical;
-                min-height: 100px;
-            }
-            textarea:focus {
-                outline: none;
-                border-color: #667eea;
-            }
-            button {
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                border: none;
-                padding: 12px 30px;
-                font-size: 16px;
-                border-radius: 5px;
-                cursor: pointer;
-                margin-top: 10px;
-            }
-            button:hover {
-                transform: translateY(-2px);
-                box-shadow: 0 5px 15px rgba(102, 126, 234, 0.4);
-            }
-            button:disabled {
-                background: #ccc;
-                cursor: not-allowed;
-            }
-            .response-section {
-                margin-top: 30px;
-                padding: 20px;
-                background: #f9f9f9;
-                border-radius: 5px;
-                display: none;
-            }
-            .response-content {
-                white-space: pre-wrap;
-                line-height: 1.6;
-            }
-            .stats {
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-                gap: 15px;
-                margin-top: 20px;
-            }
-            .stat-card {
-                background: white;
-                padding: 15px;
-                border-radius: 5px;
-                border-left: 4px solid #667eea;
-            }
-            .stat-label {
-                color: #666;
-                font-size: 14px;
-            }
-            .stat-value {
-                font-size: 24px;
-                font-weight: bold;
-                color: #667eea;
-                margin-top: 5px;
-            }
-            .loading {
-                display: none;
-                text-align: center;
-                padding: 20px;
-            }
-            .spinner {
-                border: 4px solid #f3f3f3;
-                border-top: 4px solid #667eea;
-                border-radius: 50%;
-                width: 40px;
-                height: 40px;
-                animation: spin 1s linear infinite;
-                margin: 0 auto;
-            }
-            @keyframes spin {
-                0% { transform: rotate(0deg); }
-                100% { transform: rotate(360deg); }
-            }
-            .example-queries {
-                margin-top: 20px;
-            }
-            .example-query {
-                background: #f0f0f0;
-                padding: 10px;
-                border-radius: 5px;
-                margin-bottom: 10px;
-                cursor: pointer;
-            }
-            .example-query:hover {
-                background: #e0e0e0;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>🤖 ADK Multi-Agent System with SurrealDB Memory</h1>
-            <p class="subtitle">Ask questions and watch agents research, remember, and collaborate</p>
-            
-            <div class="query-section">
-                <label for="query"><strong>Your Question:</strong></label>
-                <textarea id="query" placeholder="Ask anything... The agents will search, learn, and remember!"></textarea>
-                <button onclick="submitQuery()" id="submitBtn">Ask Agents</button>
-            </div>
-            
-            <div class="example-queries">
-                <strong>Try these examples:</strong>
-                <div class="example-query" onclick="setQuery('What are the latest trends in containerization?')">
-                    🔍 What are the latest trends in containerization?
-                </div>
-                <div class="example-query" onclick="setQuery('How does Docker Compose help with microservices?')">
-                    🐳 How does Docker Compose help with microservices?
-                </div>
-                <div class="example-query" onclick="setQuery('What did we learn about containers earlier?')">
-                    💭 What did we learn about containers earlier?
-                </div>
-            </div>
-            
-            <div class="loading" id="loading">
-                <div class="spinner"></div>
-                <p>Agents are working...</p>
-            </div>
-            
-            <div class="response-section" id="responseSection">
-                <h2>Response:</h2>
-                <div class="response-content" id="responseContent"></div>
-                
-                <div class="stats">
-                    <div class="stat-card">
-                        <div class="stat-label">Research Items Found</div>
-                        <div class="stat-value" id="researchCount">0</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-label">Memory Used</div>
-                        <div class="stat-value" id="memoryUsed">No</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-label">Session ID</div>
-                        <div class="stat-value" id="sessionId" style="font-size: 14px;">-</div>
-                    </div>
-                </div>
-            </div>
-        </div>
-        
-        <script>
-            let currentSessionId = null;
-            
-            function setQuery(text) {
-                document.getElementById('query').value = text;
-            }
-            
-            async function submitQuery() {
-                const query = document.getElementById('query').value.trim();
-                if (!query) {
-                    alert('Please enter a question');
-                    return;
-                }
-                
-                const submitBtn = document.getElementById('submitBtn');
-                const loading = document.getElementById('loading');
-                const responseSection = document.getElementById('responseSection');
-                
-                submitBtn.disabled = true;
-                loading.style.display = 'block';
-                responseSection.style.display = 'none';
-                
-                try {
-                    const response = await fetch('/api/query', {
-                        method: 'POST',
-                        headers: {
-                            'Content-Type': 'application/json'
-                        },
-                        body: JSON.stringify({
-                            query: query,
-                            session_id: currentSessionId
-                        })
-                    });
-                    
-                    const data = await response.json();
-                    
-                    if (response.ok) {
-                        document.getElementById('responseContent').textContent = data.response;
-                        document.getElementById('researchCount').textContent = data.research_count;
-                        document.getElementById('memoryUsed').textContent = data.memory_used ? 'Yes' : 'No';
-                        document.getElementById('sessionId').textContent = data.session_id.substring(0, 8) + '...';
-                        currentSessionId = data.session_id;
-                        responseSection.style.display = 'block';
-                    } else {
-                        alert('Error: ' + data.detail);
-                    }
-                } catch (error) {
-                    alert('Error: ' + error.message);
-                } finally {
-                    submitBtn.disabled = false;
-                    loading.style.display = 'none';
-                }
-            }
-            
-            // Allow Enter to submit (with Shift+Enter for new line)
-            document.getElementById('query').addEventListener('keydown', function(e) {
-                if (e.key === 'Enter' && !e.shiftKey) {
-                    e.preventDefault();
-                    submitQuery();
-                }
-            });
-        </script>
-    </body>
-    </html>
-    """
-    return HTMLResponse(content=html_content)
+    return HTMLResponse(content=INDEX_HTML, headers={"Cache-Control": "public, max-age=3600"})
 
 @app.post("/api/query", response_model=QueryResponse)
 async def query_agents(request: QueryRequest):
@@ -337,34 +130,37 @@ async def query_agents(request: QueryRequest):
         raise HTTPException(status_code=503, detail="Agent system not initialized")
     
     try:
-        # Generate session ID if not provided
-        session_id = request.session_id or f"session_{datetime.now().timestamp()}"
-        
-        # Store conversation in database
-        await db_client.create("conversation", {
-            "session_id": session_id,
-            "role": "user",
-            "content": request.query,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # Process query through agent system
-        result = await agent_system.process_query(request.query, session_id)
-        
-        # Store agent response
-        await db_client.create("conversation", {
-            "session_id": session_id,
-            "role": "assistant",
-            "content": result["response"],
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        return QueryResponse(
-            response=result["response"],
-            session_id=session_id,
-            research_count=result.get("research_count", 0),
-            memory_used=result.get("memory_used", False)
-        )
+        # Bound how many queries run at once; the rest wait their turn in FIFO order
+        async with QUERY_SEM:
+            # Generate session ID if not provided
+            session_id = request.session_id or f"session_{datetime.now().timestamp()}"
+            
+            # Process query through agent system; its remaining writes stay queued
+            activity = ActivityLogger(db_client)
+            result = await agent_system.process_query(request.query, session_id, activity)
+            
+            # Store the conversation in the same transaction as the agents' writes
+            activity.create("conversation", {
+                "session_id": session_id,
+                "role": "user",
+                "content": request.query,
+                "timestamp": activity.timestamp
+            })
+            activity.create("conversation", {
+                "session_id": session_id,
+                "role": "assistant",
+                "content": result["response"],
+                "timestamp": datetime.now().isoformat()
+            })
+            await activity.flush()
+            
+            # Returned directly to skip re-validating the response through QueryResponse
+            return ORJSONResponse(content={
+                "response": result["response"],
+                "session_id": session_id,
+                "research_count": result.get("research_count", 0),
+                "memory_used": result.get("memory_used", False)
+            })
     
     except Exception as e:
         logger.error(f"Error processing query: {e}", exc_info=True)
@@ -373,24 +169,24 @@ async def query_agents(request: QueryRequest):
 @app.get("/health")
 async def health():
     """Health check endpoint"""
-    return JSONResponse(content={"status": "healthy", "timestamp": datetime.now().isoformat()})
+    return ORJSONResponse(content={"status": "healthy", "timestamp": datetime.now().isoformat()})
 
 @app.get("/api/stats")
 async def get_stats():
     """Get system statistics"""
     try:
-        stats = await db_client.query("""
-            SELECT 
-                (SELECT count() FROM research GROUP ALL)[0].count AS total_research,
-                (SELECT count() FROM agent_memory GROUP ALL)[0].count AS total_memories,
-                (SELECT count() FROM conversation GROUP ALL)[0].count AS total_messages,
-                (SELECT count() FROM agent_activity GROUP ALL)[0].count AS total_activities
-        """)
+        counters = await db_client.query("SELECT * FROM stats_counter")
+        
+        stats = {field: 0 for field in STATS_COUNTERS.values()}
+        for counter in counters or []:
+            table = str(counter.get("id", "")).split(":")[-1]
+            if table in STATS_COUNTERS:
+                stats[STATS_COUNTERS[table]] = counter.get("count", 0)
         
-        return JSONResponse(content=stats[0] if stats else {})
+        return ORJSONResponse(content=stats)
     except Exception as e:
         logger.error(f"Error fetching stats: {e}")
-        return JSONResponse(content={"error": str(e)}, status_code=500)
+        return ORJSONResponse(content={"error": str(e)}, status_code=500)
 
 if __name__ == "__main__":
     import uvicorn
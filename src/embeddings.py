@@ -3,111 +3,356 @@ Embedding Generation Utilities (Lightweight Version)
 Uses OpenAI API or simple numerical embeddings
 """
 
+import asyncio
 import logging
 import os
-import hashlib
-from typing import List
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Tuple
 import numpy as np
+import xxhash
+
+try:
+    # JIT-compiles the boost/normalize kernel; plain NumPy is used when unavailable
+    from numba import njit
+except ImportError:
+    njit = None
 
 logger = logging.getLogger(__name__)
 
+# Resolved once at import rather than on every embedding call
+_OPENAI_KEY = os.getenv("OPENAI_API_KEY")
+_USE_OPENAI = os.getenv("USE_OPENAI", "false").lower() == "true" and bool(_OPENAI_KEY)
+
 # Simple embedding dimension (compatible with SurrealDB)
 EMBEDDING_DIM = 384
 
-async def generate_embedding(text: str) -> List[float]:
+# "int8" also stores research embeddings quantized (4x smaller to load and
+# scan); "float32" keeps full precision only, for accuracy validation
+EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "int8").lower()
+
+# Words that get dedicated dimensions in simple embeddings
+COMMON_WORDS = ['docker', 'compose', 'container', 'agent', 'database', 'surreal', 
+                'memory', 'search', 'query', 'ai', 'system', 'service']
+
+# Boosts are added to the raw Gaussian draw, whose norm is about
+# sqrt(EMBEDDING_DIM); scaling by that keeps a boost worth ~0.1 of a unit vector
+WORD_BOOST = 0.1 * np.sqrt(EMBEDDING_DIM)
+
+def _build_boost_matrix() -> np.ndarray:
+    """Precompute a (words, EMBEDDING_DIM) matrix; row i boosts COMMON_WORDS[i]'s 5 dimensions"""
+    boosts = np.zeros((len(COMMON_WORDS), EMBEDDING_DIM), dtype=np.float32)
+    for i in range(len(COMMON_WORDS)):
+        dim_index = (i * 30) % EMBEDDING_DIM
+        boosts[i, dim_index:dim_index + 5] = WORD_BOOST
+    return boosts
+
+_BOOST_MATRIX = _build_boost_matrix()
+
+# One case-insensitive scan finds every common word without lowercasing a
+# copy of the text; the lookahead lets matches overlap, so e.g. "ai" is
+# still found inside "container", as with substring tests
+_WORD_RE = re.compile(
+    "(?=(" + "|".join(map(re.escape, COMMON_WORDS)) + "))",
+    re.IGNORECASE | re.ASCII
+)
+_WORD_BITS = {word: 1 << i for i, word in enumerate(COMMON_WORDS)}
+
+def _word_mask(text: str) -> int:
+    """Bitmask with bit i set when COMMON_WORDS[i] occurs in the text, ignoring case"""
+    mask = 0
+    for word in _WORD_RE.findall(text):
+        mask |= _WORD_BITS[word.lower()]
+    return mask
+
+if njit is not None:
+    @njit(cache=True, fastmath=True, nogil=True)
+    def _boost_and_normalize(embedding, mask, boosts):
+        """Add the boost row for every bit set in mask, then scale to unit length, in place"""
+        for i in range(boosts.shape[0]):
+            if (mask >> i) & 1:
+                for j in range(embedding.shape[0]):
+                    embedding[j] += boosts[i, j]
+        total = np.float32(0.0)
+        for j in range(embedding.shape[0]):
+            total += embedding[j] * embedding[j]
+        if total > 0:
+            scale = np.float32(1.0) / np.sqrt(total)
+            for j in range(embedding.shape[0]):
+                embedding[j] *= scale
+        return embedding
+    
+    # Serial and GIL-free: batches are spread over _EMBED_POOL's threads, and a
+    # parallel kernel inside each would oversubscribe the cores (and is unsafe
+    # to launch from several threads under Numba's workqueue layer)
+    @njit(cache=True, fastmath=True, nogil=True)
+    def _batch_boost_and_normalize(embeddings, masks, boosts):
+        """_boost_and_normalize over every row, in place"""
+        for i in range(embeddings.shape[0]):
+            _boost_and_normalize(embeddings[i], masks[i], boosts)
+        return embeddings
+else:
+    def _boost_and_normalize(embedding, mask, boosts):
+        """Add the boost row for every bit set in mask, then scale to unit length, in place"""
+        for i in range(boosts.shape[0]):
+            if (mask >> i) & 1:
+                embedding += boosts[i]
+        # np.dot on a contiguous float32 vector is one SIMD kernel call,
+        # unlike np.linalg.norm's generic path
+        total = np.dot(embedding, embedding)
+        if total > 0:
+            embedding *= np.float32(1.0) / np.sqrt(total)
+        return embedding
+    
+    _batch_boost_and_normalize = None
+
+# Simple embeddings are CPU-bound NumPy work, so they run here rather than
+# on the event loop where they would stall every other request
+_EMBED_POOL = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="embedding")
+
+# Acknowledgements and greetings that can never retrieve anything useful
+_TRIVIAL_TEXTS = frozenset(["yes", "yep", "okay", "thanks", "thank you", "hello", "hey", "cool", "sure"])
+_TRIVIAL_MAX_LEN = max(map(len, _TRIVIAL_TEXTS))
+
+# Returned for trivial texts; scores 0 against everything, so it matches nothing
+_ZERO_EMBEDDING = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+_ZERO_EMBEDDING.setflags(write=False)
+
+def _is_trivial(text: str) -> bool:
+    stripped = text.strip()
+    if len(stripped) > _TRIVIAL_MAX_LEN:
+        return False
+    lowered = stripped.lower()
+    # Short common words like "ai" are real topics, not noise
+    return (len(stripped) < 3 and lowered not in _WORD_BITS) or lowered in _TRIVIAL_TEXTS
+
+async def generate_embedding(text: str) -> np.ndarray:
     """
     Generate embedding vector for text
     Uses OpenAI if API key available, otherwise creates simple numerical embedding
+    Trivial texts (blank, very short, or acknowledgements) get a zero vector
     """
-    try:
-        # Try OpenAI first if API key is available
-        if os.getenv("USE_OPENAI", "false").lower() == "true" and os.getenv("OPENAI_API_KEY"):
-            return await generate_openai_embedding(text)
-        else:
-            # Fall back to simple numerical embedding
-            return generate_simple_embedding(text)
-    except Exception as e:
-        logger.error(f"Error generating embedding: {e}")
-        # Return a valid random embedding as fallback
-        return generate_simple_embedding(text)
+    if not text or _is_trivial(text):
+        return _ZERO_EMBEDDING
+    if _USE_OPENAI:
+        # Falls back to the simple embedding itself if the API call fails
+        return await generate_openai_embedding(text)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_EMBED_POOL, generate_simple_embedding, text)
+
+def normalize(embedding) -> np.ndarray:
+    """Return the embedding as a unit-length float32 vector"""
+    vector = np.asarray(embedding, dtype=np.float32)
+    total = np.dot(vector, vector)
+    if total > 0:
+        vector = vector * (np.float32(1.0) / np.sqrt(total))
+    return vector
+
+def quantize(embedding) -> Tuple[np.ndarray, float]:
+    """
+    Symmetric per-vector int8 quantization
+    Returns (values, scale) such that embedding ≈ values * scale
+    """
+    vector = np.asarray(embedding, dtype=np.float32)
+    scale = float(np.max(np.abs(vector))) / 127.0 if vector.size else 0.0
+    if scale == 0:
+        return np.zeros(vector.shape, dtype=np.int8), 0.0
+    return np.clip(np.round(vector / scale), -127, 127).astype(np.int8), scale
+
+def dequantize(values, scale: float) -> np.ndarray:
+    """Inverse of quantize(), back to a float32 vector"""
+    return np.asarray(values, dtype=np.float32) * np.float32(scale)
 
-async def generate_openai_embedding(text: str) -> List[float]:
+class _OpenAIEmbeddingCache:
+    """LRU cache of OpenAI embeddings keyed on the exact input text"""
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+    
+    def get(self, text: str) -> Optional[np.ndarray]:
+        embedding = self._entries.get(text)
+        if embedding is not None:
+            self._entries.move_to_end(text)
+        return embedding
+    
+    def put(self, text: str, embedding: np.ndarray):
+        if self.max_size <= 0:
+            return
+        # Cached arrays are handed out without copying, so freeze them
+        embedding.setflags(write=False)
+        self._entries[text] = embedding
+        self._entries.move_to_end(text)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+_openai_cache = _OpenAIEmbeddingCache(max_size=int(os.getenv("OPENAI_EMBEDDING_CACHE_SIZE", "1024")))
+
+# One client for the process so its HTTP/2 connection pool is reused across
+# calls; created on first use and closed by close_openai_client()
+_openai_client = None
+_openai_client_lock = asyncio.Lock()
+
+async def _get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        async with _openai_client_lock:
+            if _openai_client is None:
+                import httpx
+                from openai import AsyncOpenAI
+                
+                _openai_client = AsyncOpenAI(
+                    api_key=_OPENAI_KEY,
+                    http_client=httpx.AsyncClient(
+                        http2=True,
+                        limits=httpx.Limits(max_keepalive_connections=20)
+                    )
+                )
+    return _openai_client
+
+async def close_openai_client():
+    """Close the shared OpenAI client, if one was created"""
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+
+async def generate_openai_embedding(text: str) -> np.ndarray:
     """Generate embedding using OpenAI API"""
+    cached = _openai_cache.get(text)
+    if cached is not None:
+        return cached
+    
     try:
-        from openai import AsyncOpenAI
-        
-        client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        client = await _get_openai_client()
         response = await client.embeddings.create(
             model="text-embedding-3-small",
             input=text,
             dimensions=EMBEDDING_DIM
         )
         
-        embedding = response.data[0].embedding
+        # Unit length lets similarity search use a plain dot product
+        embedding = normalize(response.data[0].embedding)
         logger.info(f"Generated OpenAI embedding with {len(embedding)} dimensions")
+        _openai_cache.put(text, embedding)
         return embedding
         
     except Exception as e:
         logger.warning(f"OpenAI embedding failed: {e}, falling back to simple embedding")
-        return generate_simple_embedding(text)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_EMBED_POOL, generate_simple_embedding, text)
 
-def generate_simple_embedding(text: str) -> List[float]:
+def generate_simple_embedding(text: str) -> np.ndarray:
     """
     Generate a simple but consistent numerical embedding from text
     This is a deterministic approach that works without external models
+    Returns a read-only float32 vector; SurrealDBClient converts it on write
     """
-    # Create a consistent hash-based seed from the text
-    text_hash = hashlib.sha256(text.encode()).digest()
-    seed = int.from_bytes(text_hash[:4], byteorder='big')
+    return _simple_embedding_cached(text)
+
+@lru_cache(maxsize=4096)
+def _simple_embedding_cached(text: str) -> np.ndarray:
+    """Compute a simple embedding; memoized since the same text always maps to the same vector"""
+    # Create a consistent hash-based seed from the text (only 32 bits are
+    # needed, so a fast non-cryptographic hash is enough)
+    seed = xxhash.xxh32_intdigest(text.encode())
     
-    # Use numpy for consistent random generation based on text
-    rng = np.random.RandomState(seed)
+    # Use numpy's PCG64 generator for consistent random generation based on text
+    rng = np.random.default_rng(seed)
     
-    # Generate base embedding
-    embedding = rng.randn(EMBEDDING_DIM).astype(float)
+    # Generate base embedding (float32 throughout; SurrealDB stores nothing wider)
+    embedding = rng.standard_normal(EMBEDDING_DIM, dtype=np.float32)
     
-    # Normalize to unit vector (important for cosine similarity)
-    norm = np.linalg.norm(embedding)
-    if norm > 0:
-        embedding = embedding / norm
+    # Add some text-specific features to make similar texts more similar, then
+    # normalize to unit vector (important for cosine similarity)
+    _boost_and_normalize(embedding, _word_mask(text), _BOOST_MATRIX)
     
-    # Add some text-specific features to make similar texts more similar
-    text_lower = text.lower()
-    common_words = ['docker', 'compose', 'container', 'agent', 'database', 'surreal', 
-                    'memory', 'search', 'query', 'ai', 'system', 'service']
+    # Shared by every caller through the cache, so make it immutable
+    embedding.setflags(write=False)
+    return embedding
+
+def _batch_simple_embeddings_np(texts: List[str]) -> np.ndarray:
+    """
+    Vectorized generate_simple_embedding for many texts at once
+    Returns an (N, EMBEDDING_DIM) float32 matrix
+    """
+    # Each row still needs its own seeded generator to match the single-text path
+    embeddings = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    for row, text in zip(embeddings, texts):
+        seed = xxhash.xxh32_intdigest(text.encode())
+        np.random.default_rng(seed).standard_normal(dtype=np.float32, out=row)
     
-    for i, word in enumerate(common_words):
-        if word in text_lower:
-            # Boost specific dimensions for this word
-            dim_index = (i * 30) % EMBEDDING_DIM
-            embedding[dim_index:dim_index + 5] += 0.1
+    masks = np.array([_word_mask(text) for text in texts], dtype=np.int64)
+    if _batch_boost_and_normalize is not None:
+        return _batch_boost_and_normalize(embeddings, masks, _BOOST_MATRIX)
     
-    # Re-normalize after adding features
-    norm = np.linalg.norm(embedding)
-    if norm > 0:
-        embedding = embedding / norm
+    # Word-presence mask times the boost matrix applies every boost in one matmul
+    bits = ((masks[:, np.newaxis] >> np.arange(len(COMMON_WORDS))) & 1).astype(np.float32)
+    embeddings += bits @ _BOOST_MATRIX
     
-    return embedding.tolist()
+    # Row-wise squared norms in one pass, then a single in-place scale
+    totals = np.einsum("ij,ij->i", embeddings, embeddings)
+    nonzero = totals > 0
+    embeddings[nonzero] *= (np.float32(1.0) / np.sqrt(totals[nonzero]))[:, np.newaxis]
+    return embeddings
 
-async def generate_embeddings_batch(texts: List[str]) -> List[List[float]]:
-    """Generate embeddings for multiple texts"""
-    try:
-        if os.getenv("USE_OPENAI", "false").lower() == "true" and os.getenv("OPENAI_API_KEY"):
-            from openai import AsyncOpenAI
-            
-            client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Texts per _EMBED_POOL task when a batch is split across threads
+_EMBED_CHUNK = 64
+
+async def _simple_embeddings(texts: List[str]) -> List[np.ndarray]:
+    """Simple embeddings for a batch, computing each distinct text once, in chunks across _EMBED_POOL"""
+    unique = list(dict.fromkeys(texts))
+    chunks = [unique[i:i + _EMBED_CHUNK] for i in range(0, len(unique), _EMBED_CHUNK)]
+    loop = asyncio.get_running_loop()
+    matrices = await asyncio.gather(*(
+        loop.run_in_executor(_EMBED_POOL, _batch_simple_embeddings_np, chunk) for chunk in chunks
+    ))
+    rows = {}
+    for chunk, matrix in zip(chunks, matrices):
+        rows.update(zip(chunk, matrix))
+    return [rows[text] for text in texts]
+
+async def _openai_embeddings_batch(texts: List[str]) -> List[np.ndarray]:
+    """OpenAI embeddings for a batch, falling back to simple embeddings on failure"""
+    # Only send each distinct, uncached text; OpenAI bills per input token
+    rows = {}
+    missing = []
+    for text in dict.fromkeys(texts):
+        cached = _openai_cache.get(text)
+        if cached is None:
+            missing.append(text)
+        else:
+            rows[text] = cached
+    
+    if missing:
+        try:
+            client = await _get_openai_client()
             response = await client.embeddings.create(
                 model="text-embedding-3-small",
-                input=texts,
+                input=missing,
                 dimensions=EMBEDDING_DIM
             )
-            
-            embeddings = [item.embedding for item in response.data]
-            logger.info(f"Generated {len(embeddings)} OpenAI embeddings")
-            return embeddings
-        else:
-            return [generate_simple_embedding(text) for text in texts]
-            
-    except Exception as e:
-        logger.error(f"Error generating batch embeddings: {e}")
-        return [generate_simple_embedding(text) for text in texts]
+        except Exception as e:
+            logger.warning(f"OpenAI batch embedding failed: {e}, falling back to simple embeddings")
+            return await _simple_embeddings(texts)
+        
+        for text, item in zip(missing, response.data):
+            rows[text] = normalize(item.embedding)
+            _openai_cache.put(text, rows[text])
+        logger.info(f"Generated {len(missing)} OpenAI embeddings for {len(texts)} texts")
+    
+    return [rows[text] for text in texts]
+
+async def generate_embeddings_batch(texts: List[str]) -> List[np.ndarray]:
+    """Generate embeddings for multiple texts; trivial texts get a zero vector, as in generate_embedding"""
+    trivial = [not text or _is_trivial(text) for text in texts]
+    embeddable = [text for text, skip in zip(texts, trivial) if not skip]
+    if _USE_OPENAI:
+        embedded = await _openai_embeddings_batch(embeddable)
+    else:
+        embedded = await _simple_embeddings(embeddable)
+    
+    rows = iter(embedded)
+    return [_ZERO_EMBEDDING if skip else next(rows) for skip in trivial]
@@ -0,0 +1,96 @@
+"""
+Semantic Response Cache
+Short-circuits the agent pipeline when a query closely matches one already answered
+"""
+
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from embeddings import EMBEDDING_DIM, normalize
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "256"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+
+class SemanticCache:
+    """
+    LRU cache of agent responses keyed on query embeddings
+
+    A lookup scores the query against every cached embedding with a single
+    matrix-vector product; entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_size: int = SEMANTIC_CACHE_SIZE, ttl: float = SEMANTIC_CACHE_TTL):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        # query -> (unit embedding, response, created_at), least recently used first
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Stacked embeddings matching self._keys, rebuilt lazily after changes
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: list = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def _stack(self) -> np.ndarray:
+        if self._matrix is None:
+            self._keys = list(self._entries)
+            self._matrix = (
+                np.vstack([self._entries[key][0] for key in self._keys])
+                if self._keys else np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+            )
+        return self._matrix
+
+    def _remove(self, key: str):
+        del self._entries[key]
+        self._matrix = None
+
+    def get(self, query_embedding) -> Optional[Dict[str, Any]]:
+        """Return the cached response for the most similar query, if close enough"""
+        if not self._entries:
+            return None
+
+        scores = self._stack() @ normalize(query_embedding)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+
+        key = self._keys[best]
+        _, response, created_at = self._entries[key]
+        if time.monotonic() - created_at > self.ttl:
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        logger.info(f"Semantic cache hit (similarity: {scores[best]:.2%}) for cached query: {key}")
+        return response
+
+    def put(self, query: str, query_embedding, response: Dict[str, Any]):
+        """Cache a response, evicting expired and least recently used entries"""
+        if not self.enabled:
+            return
+
+        now = time.monotonic()
+        for key in [k for k, (_, _, created_at) in self._entries.items() if now - created_at > self.ttl]:
+            self._remove(key)
+
+        if query in self._entries:
+            self._remove(query)
+        while len(self._entries) >= self.max_size:
+            self._remove(next(iter(self._entries)))
+
+        self._entries[query] = (normalize(query_embedding), response, now)
+        self._matrix = None
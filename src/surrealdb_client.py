@@ -1,10 +1,38 @@
 """SurrealDB Client for Agent Memory Operations"""
+import array
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from typing import Any, Dict, List, Optional
+import numpy as np
 from surrealdb import Surreal
+from surrealdb.ws import SurrealException
 
 logger = logging.getLogger(__name__)
 
+def _to_wire(value):
+    """
+    Convert packed vectors (e.g. float32 embeddings) nested in a payload to
+    lists the driver can encode; the SDK has no binary path for buffers
+    """
+    if isinstance(value, (np.ndarray, array.array, memoryview)):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {key: _to_wire(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_wire(item) for item in value]
+    return value
+
+def _check_statements(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Raise if any statement failed; statement errors arrive inside a
+    successful RPC response with status "ERR" rather than as an exception
+    """
+    for statement in results or []:
+        if statement.get("status") == "ERR":
+            raise SurrealException(statement.get("result") or statement.get("detail") or "SurrealQL statement failed")
+    return results
+
 class SurrealDBClient:
     def __init__(self, url: str, namespace: str, database: str, username: str, password: str):
         self.url = url
@@ -30,17 +58,86 @@ class SurrealDBClient:
             await self.client.close()
     
     async def create(self, table: str, data: Dict[str, Any]):
-        return await self.client.create(table, data)
+        return await self.client.create(table, _to_wire(data))
     
     async def query(self, sql: str, params: Optional[Dict[str, Any]] = None):
-        result = await self.client.query(sql, params) if params else await self.client.query(sql)
-        return result[0] if result else []
+        params = _to_wire(params)
+        results = await self.client.query(sql, params) if params else await self.client.query(sql)
+        # The driver wraps each statement's rows as {"result", "status", "time"}
+        results = _check_statements(results)
+        return (results[0].get("result") or []) if results else []
+    
+    async def transaction(self, statements: List[str], params: Optional[Dict[str, Any]] = None):
+        """Run several statements as one transaction in a single round-trip"""
+        sql = "BEGIN TRANSACTION;\n" + ";\n".join(statements) + ";\nCOMMIT TRANSACTION;"
+        params = _to_wire(params)
+        results = await self.client.query(sql, params) if params else await self.client.query(sql)
+        return _check_statements(results)
     
     async def select(self, target: str):
         return await self.client.select(target)
     
     async def update(self, target: str, data: Dict[str, Any]):
-        return await self.client.update(target, data)
+        return await self.client.update(target, _to_wire(data))
     
     async def delete(self, target: str):
         return await self.client.delete(target)
+
+class SurrealDBPool:
+    """
+    Pool of persistent SurrealDB connections
+    
+    Exposes the same operations as SurrealDBClient, but runs each one on an
+    idle connection so concurrent requests don't queue behind each other on
+    a single websocket.
+    """
+    
+    def __init__(self, url: str, namespace: str, database: str, username: str, password: str, size: int = 4):
+        self.size = size
+        self._clients = [
+            SurrealDBClient(url, namespace, database, username, password)
+            for _ in range(size)
+        ]
+        self._idle: asyncio.Queue = asyncio.Queue()
+    
+    async def connect(self):
+        await asyncio.gather(*(client.connect() for client in self._clients))
+        for client in self._clients:
+            self._idle.put_nowait(client)
+        logger.info(f"✅ SurrealDB connection pool ready ({self.size} connections)")
+    
+    async def close(self):
+        await asyncio.gather(*(client.close() for client in self._clients))
+    
+    @asynccontextmanager
+    async def acquire(self):
+        """Borrow a connection for the duration of the block"""
+        client = await self._idle.get()
+        try:
+            yield client
+        finally:
+            self._idle.put_nowait(client)
+    
+    async def create(self, table: str, data: Dict[str, Any]):
+        async with self.acquire() as client:
+            return await client.create(table, data)
+    
+    async def query(self, sql: str, params: Optional[Dict[str, Any]] = None):
+        async with self.acquire() as client:
+            return await client.query(sql, params)
+    
+    async def transaction(self, statements: List[str], params: Optional[Dict[str, Any]] = None):
+        async with self.acquire() as client:
+            return await client.transaction(statements, params)
+    
+    async def select(self, target: str):
+        async with self.acquire() as client:
+            return await client.select(target)
+    
+    async def update(self, target: str, data: Dict[str, Any]):
+        async with self.acquire() as client:
+            return await client.update(target, data)
+    
+    async def delete(self, target: str):
+        async with self.acquire() as client:
+            return await client.delete(target)
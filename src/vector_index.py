@@ -0,0 +1,190 @@
+"""
+In-Process Vector Index for Research Memory
+Keeps research embeddings in a contiguous int8/float32 matrix for fast top-k search
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from embeddings import EMBEDDING_DIM, EMBEDDING_DTYPE, dequantize, normalize, quantize
+
+try:
+    # SIMD distance kernels (AVX2/AVX-512/NEON); NumPy is used when unavailable
+    import simsimd
+except ImportError:
+    simsimd = None
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+logger = logging.getLogger(__name__)
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _dot_scores(matrix, query):
+        """Row-wise dot products, parallel over rows (exact for int8 inputs)"""
+        scores = np.empty(matrix.shape[0], dtype=np.float32)
+        for i in prange(matrix.shape[0]):
+            acc = np.float32(0.0)
+            for j in range(matrix.shape[1]):
+                acc += np.float32(matrix[i, j]) * np.float32(query[j])
+            scores[i] = acc
+        return scores
+else:
+    _dot_scores = None
+
+class ResearchIndex:
+    """
+    In-process mirror of the research table
+
+    Stored as a structure of arrays: one C-contiguous embedding matrix plus
+    parallel id/query/findings lists. Rows are L2-normalized on insert (and
+    optionally quantized to int8), so cosine similarity reduces to a dot
+    product and a query is scored against every stored vector with one SIMD
+    kernel call instead of a SurrealQL scan. The matrix grows by doubling,
+    so appends are amortized O(1). The mirror holds what load() read at startup plus this process's
+    own inserts; rows written by other workers appear after a restart.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, dtype: str = EMBEDDING_DTYPE, capacity: int = 64):
+        self.dim = dim
+        self.dtype = np.int8 if dtype == "int8" else np.float32
+        self._matrix = np.zeros((capacity, dim), dtype=self.dtype)
+        # Per-row int8 scales; a row's cosine with the query is dot * scale * query scale
+        self._scales = np.zeros(capacity, dtype=np.float32)
+        self._size = 0
+        self.ids: List[str] = []
+        self.queries: List[str] = []
+        self.findings: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        return self._matrix[:self._size]
+
+    def _encode(self, embedding, quantized=None, scale=None) -> Tuple[np.ndarray, float]:
+        """Convert an embedding to the index's storage format, returning (vector, scale)"""
+        if self.dtype == np.int8:
+            if quantized is not None and scale is not None:
+                return np.asarray(quantized, dtype=np.int8), float(scale)
+            return quantize(normalize(embedding))
+        return normalize(embedding), 1.0
+
+    def _grow(self):
+        capacity = max(1, 2 * len(self._matrix))
+        matrix = np.zeros((capacity, self.dim), dtype=self.dtype)
+        matrix[:self._size] = self.embeddings
+        scales = np.zeros(capacity, dtype=np.float32)
+        scales[:self._size] = self._scales[:self._size]
+        self._matrix, self._scales = matrix, scales
+
+    def _add_record(self, record: Dict[str, Any]):
+        embedding = record.get("embedding")
+        quantized = record.get("embedding_i8")
+        scale = record.get("embedding_scale")
+        if quantized is None or scale is None:
+            quantized = scale = None
+        elif embedding is None and self.dtype != np.int8:
+            embedding = dequantize(quantized, scale)
+        vector = quantized if embedding is None else embedding
+        if vector is None or len(vector) != self.dim:
+            return
+        self.add(
+            str(record.get("id", "")),
+            record.get("query", ""),
+            record.get("findings", ""),
+            embedding,
+            quantized,
+            scale
+        )
+
+    async def load(self, db_client):
+        """Populate the index from the research table"""
+        if self.dtype == np.int8:
+            # Read the int8 copy (4x less data); only rows stored without one
+            # need the float32 column
+            records = await db_client.query(
+                "SELECT id, query, findings, embedding_i8, embedding_scale FROM research WHERE embedding_i8 != NONE"
+            )
+            records += await db_client.query(
+                "SELECT id, query, findings, embedding FROM research WHERE embedding_i8 = NONE"
+            )
+        else:
+            records = await db_client.query(
+                "SELECT id, query, findings, embedding FROM research WHERE embedding != NONE"
+            )
+            # Rows stored with only the int8 copy are dequantized in _add_record
+            records += await db_client.query(
+                "SELECT id, query, findings, embedding_i8, embedding_scale FROM research "
+                "WHERE embedding = NONE AND embedding_i8 != NONE"
+            )
+        for record in records:
+            self._add_record(record)
+        self.ready = True
+        logger.info(f"Loaded {len(self)} research embeddings into the in-process index")
+
+    def add(self, research_id: str, query: str, findings: str, embedding,
+            quantized=None, scale: Optional[float] = None):
+        """Append a research row, ignoring IDs already present"""
+        if research_id in self._positions:
+            return
+        if self._size == len(self._matrix):
+            self._grow()
+
+        vector, scale = self._encode(embedding, quantized, scale)
+        row = self._size
+        self._matrix[row] = vector
+        self._scales[row] = scale
+        self._size += 1
+
+        self.ids.append(research_id)
+        self.queries.append(query)
+        self.findings.append(findings)
+        self._positions[research_id] = row
+
+    def search(self, query_embedding, threshold: float = 0.6, limit: int = 5) -> List[Dict[str, Any]]:
+        """Return up to `limit` rows with cosine similarity above `threshold`, best first"""
+        if not self._positions:
+            return []
+
+        # Both sides are unit vectors, so the dot product is the cosine similarity
+        embeddings = self.embeddings
+        query_vector, query_scale = self._encode(query_embedding)
+        if simsimd is not None:
+            scores = np.asarray(
+                simsimd.cdist(query_vector[np.newaxis, :], embeddings, metric="dot"),
+                dtype=np.float32
+            )[0]
+        elif self.dtype == np.int8 and _dot_scores is not None:
+            # NumPy has no BLAS kernel for integer matmul; Numba vectorizes it
+            scores = _dot_scores(embeddings, query_vector)
+        elif self.dtype == np.int8:
+            scores = (embeddings.astype(np.int32) @ query_vector.astype(np.int32)).astype(np.float32)
+        else:
+            scores = embeddings @ query_vector
+
+        if self.dtype == np.int8:
+            scores = scores * self._scales[:self._size] * np.float32(query_scale)
+
+        k = min(limit, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [
+            {
+                "id": self.ids[i],
+                "query": self.queries[i],
+                "findings": self.findings[i],
+                "score": float(scores[i])
+            }
+            for i in top
+            if scores[i] > threshold
+        ]